@@ -16,15 +16,19 @@ Assumptions matching your setup:
 - Consoles: Playback LAs (0x4, 0x8, 0xB in practice)
 """
 
+import io
+import logging
+import os
+import re
+import selectors
 import subprocess
 import sys
 import time
-import re
 
 # ---- CONFIG -------------------------------------------------------------
 
 # Treat these logical addresses as "playback devices" (consoles + Apple TV).
-CONSOLE_LAS = {0x4, 0x8, 0xB}
+CONSOLE_LAS = frozenset({0x4, 0x8, 0xB})
 
 DENON_LA = 0x5
 
@@ -38,26 +42,79 @@ MIN_INJECTION_INTERVAL_SEC = 3.0
 # Start in dry-run so you can verify behavior without actually sending.
 DRY_RUN = False
 
+# Echo every raw cec-client line to stdout. Useful for correlating events
+# while debugging, but on a busy bus the echo costs more than everything else.
+VERBOSE = False
+
 # ------------------------------------------------------------------------
 
+# System Audio Mode Request (TV -> Audio System), as cec-client "tx" command
+# and newline, handed to os.writev() as two iovecs instead of concatenating.
+TX_CMD = (b"tx 15:70:00:00", b"\n")
+TX_TEXT = TX_CMD[0].decode()  # same command, for log messages
+
+log = logging.getLogger("cec")
+
 
 FRAME_RE = re.compile(
-    r'>>\s+([0-9A-Fa-f]{2}):'      # header byte (source/dest LAs)
-    r'([0-9A-Fa-f]{2})'            # opcode
-    r'(?:[:]([0-9A-Fa-f:]+))?'     # optional data bytes
+    rb'>>\s+([0-9A-Fa-f]{2}):'      # header byte (source/dest LAs)
+    rb'([0-9A-Fa-f]{2})'            # opcode
+    rb'(?:[:]([0-9A-Fa-f:]+))?'     # optional data bytes
+)
+
+# 256-entry table: ASCII byte -> hex nibble value, 0xFF for non-hex bytes.
+NIB = bytes(
+    int(chr(c), 16) if chr(c) in "0123456789abcdefABCDEF" else 0xFF
+    for c in range(256)
 )
 
+# Cheap substring prefilters, checked against every raw TRAFFIC line before
+# any real parsing. cec-client prints frames in lowercase hex.
+FRAME_MARKER = b">> "                    # start of a received frame
+SAM_NEEDLE = b">> %xf:72:01" % DENON_LA  # Denon: Set System Audio Mode ON
+AS_NEEDLE = b":82:"                      # candidate Active Source frame
+
+# Same idea pushed into a grep stage between cec-client and us, so lines that
+# can't be either frame are never read by Python at all (skipped if VERBOSE).
+FILTER_CMD = [
+    "grep", "--line-buffered", "-E",
+    ">> ..:82:|>> %xf:72:01" % DENON_LA,
+]
+
+
+# [second, formatted] for now_str(), so strftime runs at most once a second.
+_ts_cache = [0, ""]
+
 
 def now_str() -> str:
-    return time.strftime("%H:%M:%S")
+    s = int(time.time())
+    if s != _ts_cache[0]:
+        _ts_cache[0] = s
+        _ts_cache[1] = time.strftime("%H:%M:%S", time.localtime(s))
+    return _ts_cache[1]
+
+
+class _Now:
+    """Log argument that renders as now_str(), only if the record is emitted."""
+
+    def __str__(self):
+        return now_str()
+
+
+NOW = _Now()
 
 
 def parse_frame(line):
     """
-    Parse a TRAFFIC line like:
+    Parse a TRAFFIC line (bytes) like:
       TRAFFIC: [   37491]     >> bf:82:36:00
 
-    Returns (src_la, dst_la, opcode, data_bytes) or None if not a frame.
+    Returns (src_la, dst_la, opcode, data_raw) or None if not a frame, where
+    data_raw is the undecoded "hh:hh:..." text after the opcode (possibly
+    empty); use data_byte() to pull out individual bytes.
+
+    Regex reference version of scan_frame(); handy when debugging odd
+    cec-client output, but not used on the hot path.
     """
     m = FRAME_RE.search(line)
     if not m:
@@ -65,169 +122,373 @@ def parse_frame(line):
 
     header = int(m.group(1), 16)
     opcode = int(m.group(2), 16)
-    data_raw = m.group(3)
+    data_raw = m.group(3) or b""
 
     src_la = header >> 4
     dst_la = header & 0xF
 
-    data = []
-    if data_raw:
-        data = [int(b, 16) for b in data_raw.split(":") if b]
+    return src_la, dst_la, opcode, data_raw
+
+
+def scan_frame(frame):
+    """
+    Hand-coded scanner for ">> hh:hh[:hh...]" frames, without going through
+    the regex engine.
+
+    Where parse_frame() searches a whole TRAFFIC line, frame must already
+    start at FRAME_MARKER (anything else returns None). It can be any
+    bytes-like object, e.g. a memoryview slice of the read buffer, and is
+    only indexed into.
+
+    Returns (src_la, dst_la, opcode, data_raw) or None if not a frame;
+    data_raw is a small bytes copy, so no view outlives the read buffer.
+    """
+    n = len(frame)
+    if (
+        n < 8
+        or frame[0] != 0x3E or frame[1] != 0x3E or frame[2] != 0x20  # ">> "
+        or frame[5] != 0x3A  # ':'
+    ):
+        return None
+
+    # The header's two nibbles are the source and destination LAs.
+    src_la = NIB[frame[3]]
+    dst_la = NIB[frame[4]]
+    op_hi = NIB[frame[6]]
+    op_lo = NIB[frame[7]]
+    if (src_la | dst_la | op_hi | op_lo) > 0xF:
+        return None
+
+    # Leave the data bytes undecoded; callers only ever look at one or two.
+    data_raw = b""
+    if n > 8 and frame[8] == 0x3A:
+        end = n
+        while end > 9 and frame[end - 1] in b" \t\r":
+            end -= 1
+        data_raw = bytes(frame[9:end])
 
-    return src_la, dst_la, opcode, data
+    return src_la, dst_la, (op_hi << 4) | op_lo, data_raw
+
+
+def data_byte(data_raw, i):
+    """Decode byte i of a "hh:hh:..." data_raw string from parse/scan_frame."""
+    j = i * 3
+    return (NIB[data_raw[j]] << 4) | NIB[data_raw[j + 1]]
+
+
+def drop_sent(bufs, n):
+    """Drop the first n bytes from a list of buffers after a partial writev()."""
+    while n:
+        head = bufs[0]
+        if n < len(head):
+            bufs[0] = head[n:]
+            return
+        n -= len(head)
+        del bufs[0]
 
 
 def main():
-    print("[INFO] Starting CEC auto-audio helper.")
-    print(f"[INFO] DRY_RUN = {DRY_RUN}")
-    print("[INFO] Strategy:")
-    print("  - Watch for Active Source (opcode 0x82) from any Playback LA.")
-    print("  - Give Samsung/Denon a moment to do their own 5f:72:01.")
-    print("  - If they don't, send: tx 15:70:00:00 (System Audio Mode Request).")
-    print()
+    # In verbose mode the raw echo and our own messages share one large
+    # buffer; the log handler flushes it whenever we emit an event.
+    raw_out = None
+    if VERBOSE:
+        sys.stdout.flush()
+        raw_out = io.BufferedWriter(
+            io.FileIO(sys.stdout.fileno(), "wb", closefd=False),
+            buffer_size=64 * 1024,
+        )
+        sys.stdout = io.TextIOWrapper(
+            raw_out,
+            encoding=sys.stdout.encoding,
+            errors=sys.stdout.errors,
+            write_through=True,
+        )
+
+    # Messages are passed as %-style args, so they're only formatted if the
+    # level is actually enabled.
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
+
+    log.info("[INFO] Starting CEC auto-audio helper.")
+    log.info("[INFO] DRY_RUN = %s", DRY_RUN)
+    log.info("[INFO] Strategy:")
+    log.info("  - Watch for Active Source (opcode 0x82) from any Playback LA.")
+    log.info("  - Give Samsung/Denon a moment to do their own 5f:72:01.")
+    log.info("  - If they don't, send: tx 15:70:00:00 (System Audio Mode Request).")
+    log.info("")
 
     # One interactive cec-client; we both read and write to it.
     # -d 8 = TRAFFIC only, which keeps output manageable.
     # (You can also bump this to 31 while debugging.)
+    # stderr is not merged into the pipe we parse; it goes straight to our
+    # own stderr (the journal under systemd) for diagnostics.
     cmd = ["cec-client", "-d", "8"]
     proc = subprocess.Popen(
         cmd,
         stdin=subprocess.PIPE,
         stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        bufsize=1,
-        text=True,
+        stderr=None,
+        bufsize=0,
     )
 
     if proc.stdin is None or proc.stdout is None:
-        print("[ERROR] Failed to open cec-client pipes.")
+        log.error("[ERROR] Failed to open cec-client pipes.")
         sys.exit(1)
 
+    # Unless we want the full trace, read cec-client's output through grep.
+    # We keep writing commands straight to cec-client's stdin.
+    filt = None
+    out = proc.stdout
+    if not VERBOSE:
+        filt = subprocess.Popen(
+            FILTER_CMD,
+            stdin=proc.stdout,
+            stdout=subprocess.PIPE,
+            bufsize=0,
+        )
+        proc.stdout.close()
+        out = filt.stdout
+
     # State: pending console that just became active, waiting to see if Denon
     # responds on its own with 5f:72:01.
-    pending = None  # dict with keys: la, phys, deadline
-    last_injection_time = 0.0
-
-    print(f"[INFO] Spawned: {' '.join(cmd)}")
-    print("[INFO] Watching CEC traffic...\n")
+    pending = None  # dict: la, phys (byte pair), + deadline without a timerfd
+    # Monotonic clock, so wall-clock adjustments can't stretch or skip timers.
+    last_injection_time = float("-inf")
+
+    log.info("[INFO] Spawned: %s", " ".join(cmd))
+    if filt is not None:
+        log.info("[INFO] Filtering through: %s", " ".join(FILTER_CMD))
+    log.info("[INFO] Watching CEC traffic...\n")
+
+    # Wait on cec-client output with a selector instead of iterating the pipe,
+    # so a pending injection still fires on time when the bus goes quiet.
+    out_fd = out.fileno()
+    os.set_blocking(out_fd, False)
+    sel = selectors.DefaultSelector()
+    sel.register(out_fd, selectors.EVENT_READ)
+    buf = bytearray()
+
+    # Commands for cec-client go through a non-blocking queue: stdin is only
+    # registered for EVENT_WRITE while pending_tx holds unsent buffers, so a
+    # slow cec-client can never stall the traffic watcher.
+    in_fd = proc.stdin.fileno()
+    os.set_blocking(in_fd, False)
+    pending_tx = []
+
+    # The pending injection is a one-shot timer. Where the OS offers one
+    # (Linux, Python 3.13+) it is a timerfd in the selector, armed on Active
+    # Source and disarmed by Denon; otherwise it is the select() timeout.
+    timer_fd = None
+    if hasattr(os, "timerfd_create"):
+        timer_fd = os.timerfd_create(
+            time.CLOCK_MONOTONIC, flags=os.TFD_NONBLOCK | os.TFD_CLOEXEC
+        )
+        sel.register(timer_fd, selectors.EVENT_READ)
+
+    # Loop-invariant globals bound to locals (LOAD_FAST instead of LOAD_GLOBAL).
+    _marker = FRAME_MARKER
+    _sam = SAM_NEEDLE
+    _as = AS_NEEDLE
+    _scan = scan_frame
+    _console = CONSOLE_LAS
+    _to = PENDING_TIMEOUT_SEC
+    _mono = time.monotonic
+    _ts = NOW
 
     try:
-        for line in proc.stdout:
-            line = line.rstrip("\n")
-            # Always show raw TRAFFIC lines so you can correlate later if needed.
-            print(line)
-
-            frame = parse_frame(line)
-            if not frame:
-                # Non-TRAFFIC lines / noise; still keep scanning.
-                continue
-
-            src_la, dst_la, opcode, data = frame
-
-            # 1) Denon Set System Audio Mode (5f:72:01)
-            if (
-                src_la == DENON_LA
-                and dst_la == 0xF
-                and opcode == 0x72
-                and data and data[0] == 0x01
-            ):
-                # Denon just turned System Audio Mode ON and presumably powered up.
-                ts = now_str()
-                print(f"[AUTO {ts}] Detected Denon Set System Audio Mode (5f:72:01).")
-
-                # If we were waiting to inject for a console, cancel it - the system
-                # is already doing the right thing on its own.
-                if pending is not None:
-                    la = pending["la"]
-                    phys = pending["phys"]
-                    print(
-                        f"[AUTO {ts}] Pending console LA {la:X} (phys {phys}) "
-                        f"was satisfied by natural Denon behavior; not injecting."
+        while True:
+            # Sleep until either cec-client prints something or the pending
+            # console's deadline arrives, whichever comes first.
+            timeout = None
+            if pending is not None and timer_fd is None:
+                timeout = max(0.0, pending["deadline"] - _mono())
+
+            events = sel.select(timeout)
+            expired = not events
+            readable = False
+            for key, _mask in events:
+                if key.fd == out_fd:
+                    readable = True
+                    continue
+
+                if key.fd == timer_fd:
+                    # Consume the expiration count so the fd stops polling ready.
+                    try:
+                        os.read(timer_fd, 8)
+                    except BlockingIOError:
+                        pass
+                    expired = True
+                    continue
+
+                # cec-client can take (some of) our queued commands now.
+                try:
+                    n = os.writev(in_fd, pending_tx)
+                except BlockingIOError:
+                    n = 0
+                except BrokenPipeError:
+                    log.error(
+                        "[ERROR %s] Failed to write %r to cec-client (BrokenPipeError).",
+                        _ts, b"".join(pending_tx).decode().strip(),
                     )
-                    pending = None
+                    # No point continuing if we can't send.
+                    return
+                drop_sent(pending_tx, n)
+                if not pending_tx:
+                    sel.unregister(in_fd)
+
+            if readable:
+                chunk = os.read(out_fd, 65536)
+                if not chunk:
+                    log.info("[INFO] cec-client closed its output.")
+                    break
+                buf += chunk
+
+            # One read can carry many lines; walk them by offset and trim the
+            # buffer once afterwards rather than shifting it after every line.
+            # Lines are never copied out: the needles are searched for within
+            # [start, end) of buf, and the scanner gets a memoryview slice.
+            mv = memoryview(buf)
+            pos = 0
+            for _ in range(buf.count(b"\n")):
+                start = pos
+                end = buf.find(b"\n", start)
+                pos = end + 1
+
+                if raw_out is not None:
+                    raw_out.write(mv[start:end])
+                    raw_out.write(b"\n")
+
+                # 1) Denon Set System Audio Mode (5f:72:01)
+                if buf.find(_sam, start, end) >= 0:
+                    # Denon just turned System Audio Mode ON and presumably powered up.
+                    log.info("[AUTO %s] Detected Denon Set System Audio Mode (5f:72:01).", _ts)
+
+                    # If we were waiting to inject for a console, cancel it - the system
+                    # is already doing the right thing on its own.
+                    if pending is not None:
+                        la = pending["la"]
+                        phys = pending["phys"]
+                        log.info(
+                            "[AUTO %s] Pending console LA %X (phys %02x:%02x) "
+                            "was satisfied by natural Denon behavior; not injecting.",
+                            _ts, la, *phys,
+                        )
+                        pending = None
+                        expired = False
+                        if timer_fd is not None:
+                            os.timerfd_settime(timer_fd, initial=0)
+
+                    continue
+
+                if buf.find(_as, start, end) < 0:
+                    # Any other frame / noise; nothing to do.
+                    continue
+
+                # Only lines that look like Active Source pay for a full parse.
+                i = buf.find(_marker, start, end)
+                if i < 0:
+                    continue
+                frame = _scan(mv[i:end])
+                if not frame:
+                    continue
+
+                src_la, dst_la, opcode, data = frame
+
+                # 2) Active Source from some device (opcode 0x82)
+                if dst_la == 0xF and opcode == 0x82 and len(data) >= 5:
+                    phys = (data_byte(data, 0), data_byte(data, 1))
+
+                    # Only care about LAs we treat as playback devices.
+                    if src_la in _console:
+                        log.info(
+                            "[AUTO %s] Playback/console at logical %X "
+                            "became Active Source, phys %02x:%02x.",
+                            _ts, src_la, *phys,
+                        )
 
-                continue
+                        # Start a small timer: if Denon hasn't done 5f:72:01
+                        # by the time this expires, we'll inject a System Audio
+                        # Mode Request.
+                        pending = {"la": src_la, "phys": phys}
+                        # (Re)arm the timer; an expiry already seen in this
+                        # batch belonged to the previous console.
+                        expired = False
+                        if timer_fd is None:
+                            pending["deadline"] = _mono() + _to
+                        elif _to > 0:
+                            os.timerfd_settime(timer_fd, initial=_to)
+                        else:
+                            # An initial value of 0 disarms a timerfd rather
+                            # than firing it, so treat this as already expired.
+                            expired = True
+                    else:
+                        # Some other device (TV, tuner, etc.) became active.
+                        # We don't treat it as a console trigger.
+                        log.info(
+                            "[AUTO %s] Active Source from logical %X, "
+                            "not a playback LA; ignoring.",
+                            _ts, src_la,
+                        )
 
-            # 2) Active Source from some device (opcode 0x82)
-            if dst_la == 0xF and opcode == 0x82 and len(data) >= 2:
-                phys = f"{data[0]:02x}:{data[1]:02x}"
-                ts = now_str()
+            # Keep only the trailing partial line for the next read (the
+            # bytearray can't be resized while a memoryview is exported).
+            mv.release()
+            del buf[:pos]
 
-                # Only care about LAs we treat as playback devices.
-                if src_la in CONSOLE_LAS:
-                    print(
-                        f"[AUTO {ts}] Playback/console at logical {src_la:X} "
-                        f"became Active Source, phys {phys}."
+            # 3) Timeout: should we inject our System Audio Mode Request?
+            # The timerfd reports expiry itself. Without it, an empty select()
+            # means the deadline woke us up; but a busy bus may never let
+            # select() time out, so also check the clock once per batch.
+            if pending is None:
+                continue
+            if not expired and (
+                timer_fd is not None or _mono() < pending["deadline"]
+            ):
+                continue
+            now = _mono()
+
+            src_la = pending["la"]
+            phys = pending["phys"]
+
+            # Rate limiting: don't spam if something weird happens.
+            if now - last_injection_time < MIN_INJECTION_INTERVAL_SEC:
+                log.info(
+                    "[AUTO %s] Pending console LA %X (phys %02x:%02x) "
+                    "reached timeout, but injection was recent; skipping to avoid spam.",
+                    _ts, src_la, *phys,
+                )
+                pending = None
+            else:
+                if DRY_RUN:
+                    log.info(
+                        "[AUTO %s] [DRY RUN] Would send: %s "
+                        "(System Audio Mode Request to Denon for TV).",
+                        _ts, TX_TEXT,
                     )
-
-                    # Start a small timer: if Denon hasn't done 5f:72:01
-                    # by the time this expires, we'll inject a System Audio
-                    # Mode Request.
-                    pending = {
-                        "la": src_la,
-                        "phys": phys,
-                        "deadline": time.time() + PENDING_TIMEOUT_SEC,
-                    }
                 else:
-                    # Some other device (TV, tuner, etc.) became active.
-                    # We don't treat it as a console trigger.
-                    print(
-                        f"[AUTO {ts}] Active Source from logical {src_la:X}, "
-                        "not a playback LA; ignoring."
+                    log.info(
+                        "[AUTO %s] Sending: %s "
+                        "(System Audio Mode Request to Denon for TV).",
+                        _ts, TX_TEXT,
                     )
+                    if not pending_tx:
+                        sel.register(in_fd, selectors.EVENT_WRITE)
+                    pending_tx.extend(TX_CMD)
+                    last_injection_time = now
 
-                continue
-
-            # 3) Timeout check: should we inject our System Audio Mode Request?
-            now = time.time()
-            if pending is not None and now >= pending["deadline"]:
-                src_la = pending["la"]
-                phys = pending["phys"]
-                ts = now_str()
-
-                # Rate limiting: don't spam if something weird happens.
-                if now - last_injection_time < MIN_INJECTION_INTERVAL_SEC:
-                    print(
-                        f"[AUTO {ts}] Pending console LA {src_la:X} (phys {phys}) "
-                        f"reached timeout, but injection was recent; skipping to avoid spam."
-                    )
-                    pending = None
-                else:
-                    cmd_str = "tx 15:70:00:00"
-                    if DRY_RUN:
-                        print(
-                            f"[AUTO {ts}] [DRY RUN] Would send: {cmd_str} "
-                            f"(System Audio Mode Request to Denon for TV)."
-                        )
-                    else:
-                        print(
-                            f"[AUTO {ts}] Sending: {cmd_str} "
-                            f"(System Audio Mode Request to Denon for TV)."
-                        )
-                        try:
-                            proc.stdin.write(cmd_str + "\n")
-                            proc.stdin.flush()
-                            last_injection_time = now
-                        except BrokenPipeError:
-                            print(
-                                f"[ERROR {ts}] Failed to write '{cmd_str}' to cec-client "
-                                "(BrokenPipeError)."
-                            )
-                            # No point continuing if we can't send.
-                            break
-
-                    # Either way, clear the pending console.
-                    pending = None
-
-            # If there's no pending console or no timeout yet, just keep looping.
+                # Either way, clear the pending console.
+                pending = None
 
     except KeyboardInterrupt:
-        print("\n[INFO] Interrupted by user, shutting down...")
+        log.info("\n[INFO] Interrupted by user, shutting down...")
 
     finally:
+        if timer_fd is not None:
+            os.close(timer_fd)
+        # Blocking again, so whatever is still queued goes out intact and in
+        # order, followed by a clean quit.
         try:
-            proc.stdin.write("q\n")
-            proc.stdin.flush()
+            os.set_blocking(in_fd, True)
+            os.writev(in_fd, pending_tx + [b"q\n"])
         except Exception:
             pass
         proc.terminate()
@@ -235,7 +496,13 @@ def main():
             proc.wait(timeout=2)
         except Exception:
             pass
-        print("[INFO] cec-client terminated.")
+        if filt is not None:
+            filt.terminate()
+            try:
+                filt.wait(timeout=2)
+            except Exception:
+                pass
+        log.info("[INFO] cec-client terminated.")
 
 
 if __name__ == "__main__":